@@ -1,12 +1,12 @@
+from collections import Counter
+
 import sec_parser as sp
 import streamlit as st
 from _utils.cache import cache_to_file
+from _utils.misc import remove_ix_tags
 
 
-@st.cache_data(
-    experimental_allow_widgets=True,
-    show_spinner="Retrieving SEC EDGAR document...",
-)
+@st.cache_data(show_spinner="Retrieving SEC EDGAR document...")
 @cache_to_file(
     cache_by_keys={"latest_from_ticker", "doc", "url", "sections"},
     cache_dir=".cache/metadata",
@@ -26,10 +26,7 @@ def get_metadata(
     )
 
 
-@st.cache_data(
-    experimental_allow_widgets=True,
-    show_spinner="Retrieving SEC EDGAR document...",
-)
+@st.cache_data(show_spinner="Retrieving SEC EDGAR document...")
 @cache_to_file(
     cache_by_keys={"url", "ticker", "doc", "sections"},
     cache_dir=".cache/html",
@@ -45,12 +42,101 @@ def download_html(
     retriever = sp.SecapioDataRetriever(api_key=_secapi_api_key)
     return retriever.get_report_html(doc, url, sections=sections)
 
+
+def fetch_reports(
+    secapi_api_key: str,
+    *,
+    tickers: tuple[str, ...],
+    urls: tuple[str, ...],
+    sections: tuple[sp.SectionType | str, ...] | None,
+) -> tuple[list[str], list[dict], list[str]]:
+    """
+    Return the htmls, metadatas and urls of the latest reports of the given
+    tickers, followed by the reports at the given urls.
+
+    Not cached itself, the per-document results already come from the
+    get_metadata and download_html caches.
+    """
+    # download_html and cache_to_file expect the sections as a list
+    sections = list(sections) if sections is not None else None
+    htmls, metadatas, htmls_urls = [], [], []
+    for ticker in tickers:
+        metadata = get_metadata(
+            secapi_api_key, doc="10-Q", latest_from_ticker=ticker
+        )
+        metadatas.append(metadata)
+        url = metadata["linkToFilingDetails"]
+        html = download_html(
+            secapi_api_key,
+            doc="10-Q",
+            url=url,
+            sections=sections,
+            ticker=ticker,
+        )
+        htmls_urls.append(url)
+        htmls.append(html)
+    for url in urls:
+        html = download_html(
+            secapi_api_key,
+            doc="10-Q",
+            url=url,
+            sections=sections,
+            ticker=None,
+        )
+        metadata = get_metadata(secapi_api_key, doc="10-Q", url=url)
+        metadatas.append(metadata)
+        htmls_urls.append(url)
+        htmls.append(html)
+    return htmls, metadatas, htmls_urls
+
+
 @st.cache_resource
 def get_semantic_elements(html: str) -> list[sp.AbstractSemanticElement]:
     parser = sp.SecParser()
     elements = parser.parse(html)
     return elements
 
-def get_semantic_tree(elements: list[sp.AbstractSemanticElement]) -> sp.SemanticTree:
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_semantic_tree(
+    _elements: list[sp.AbstractSemanticElement],  # prefix _ prevents hashing in st.cache_resource
+    *,
+    elements_key: tuple[int, ...],
+) -> sp.SemanticTree:
+    # The elements are owned by the get_semantic_elements cache, so their ids
+    # stay stable across reruns and identify the (filtered) input cheaply.
     tree_builder = sp.TreeBuilder()
-    return tree_builder.build(elements)
+    return tree_builder.build(_elements)
+
+
+@st.cache_resource(show_spinner=False, max_entries=100)
+def count_element_types(
+    _elements: list[sp.AbstractSemanticElement],  # prefix _ prevents hashing in st.cache_resource
+    *,
+    elements_id: int,
+) -> Counter[type[sp.AbstractSemanticElement]]:
+    # Only meant for the lists returned by get_semantic_elements, which are
+    # kept alive (and therefore keep their id) by its cache. Callers must not
+    # mutate the returned Counter, it is shared across reruns.
+    return Counter(type(element) for element in _elements)
+
+
+@st.cache_resource(show_spinner=False)
+def get_element_html(
+    _element: sp.AbstractSemanticElement,  # prefix _ prevents hashing in st.cache_resource
+    *,
+    element_id: int,
+    prettify: bool,
+) -> str:
+    # Keyed by id like get_semantic_tree. As a resource cache it is cleared
+    # together with get_semantic_elements, which keeps the element (and so its
+    # id) alive, and hits return the stored string without unpickling a copy.
+    # Not bounded: the merged tree view renders every element on each rerun,
+    # and an LRU bound below that count would miss on every lookup.
+    if prettify:
+        return _element.html_tag._bs4.prettify()
+    return remove_ix_tags(str(_element.html_tag._bs4))
+
+
+@st.cache_data(show_spinner=False)
+def get_html_without_ix_tags(html: str) -> str:
+    return remove_ix_tags(html)
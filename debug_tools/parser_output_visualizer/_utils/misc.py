@@ -1,11 +1,14 @@
 from __future__ import annotations
 from abc import ABC, ABCMeta
+import functools
 import itertools
 
 import re
 
 import bs4
 import sec_parser.semantic_elements as se
+from dateutil.parser import parse
+from dateutil.tz import tzutc
 
 import collections
 import inspect
@@ -18,6 +21,10 @@ def normalize_company_name(name):
     return name
 
 
+def format_utc_date(value: str, fmt: str) -> str:
+    return parse(value).astimezone(tzutc()).strftime(fmt)
+
+
 def generate_bool_list(idx, length):
     """
     >>> generate_bool_list(1, 3)
@@ -74,13 +81,30 @@ def get_emoji_chain(cls: type):
     return "".join(reversed(emojis))  # Reverse to start from the root parent
 
 
+@functools.lru_cache(maxsize=None)
+def get_class_display_name(element_cls):
+    return add_spaces(element_cls.__name__.replace("Element", "").strip())
+
+
 def get_pretty_class_name(element_cls, element=None, *, source: str = ""):
+    level = 0
+    if element and hasattr(element, "level"):
+        level = element.level
+    return _get_pretty_class_name(element_cls, level, source)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_pretty_class_name(element_cls, element_level: int, source: str):
+    """
+    The pretty name only depends on the class, the level and the source,
+    so it is computed once per combination rather than once per element.
+    """
     emoji_chain = get_emoji_chain(element_cls)
-    name = add_spaces(element_cls.__name__.replace("Element", "").strip())
+    name = get_class_display_name(element_cls)
 
     level = ""
-    if element and hasattr(element, "level") and element.level > 1:
-        level = f" (Level {element.level})"
+    if element_level > 1:
+        level = f" (Level {element_level})"
 
     pretty_name = f"{emoji_chain} **{name}{level}**"
 
@@ -157,12 +181,13 @@ def interleave_lists(lists):
         >>> interleave_lists([['a'], ['b'], ['c']])
         ['a', 'b', 'c']
     """
-    interleaved = []
-    max_length = max(len(lst) for lst in lists) if lists else 0
-
-    for i in range(max_length):
-        for lst in lists:
-            if i < len(lst):
-                interleaved.append(lst[i])
-
-    return interleaved
+    # A private sentinel pads the shorter lists, so that None and other falsy
+    # items of the input lists are kept.
+    fill = object()
+    return [
+        item
+        for item in itertools.chain.from_iterable(
+            itertools.zip_longest(*lists, fillvalue=fill)
+        )
+        if item is not fill
+    ]
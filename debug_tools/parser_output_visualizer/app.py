@@ -5,22 +5,22 @@ from itertools import zip_longest
 
 import streamlit as st
 import streamlit_antd_components as sac
-from _sec_parser import (download_html, get_metadata, get_semantic_elements,
+from _sec_parser import (count_element_types, fetch_reports, get_element_html,
+                         get_html_without_ix_tags, get_semantic_elements,
                          get_semantic_tree)
-from _utils.misc import (PassthroughContext, get_pretty_class_name,
+from _utils.misc import (PassthroughContext, format_utc_date,
+                         get_class_display_name, get_pretty_class_name,
                          interleave_lists, normalize_company_name,
-                         remove_duplicates_retain_order, remove_ix_tags)
+                         remove_duplicates_retain_order)
 from _utils.streamlit_ import (st_expander_allow_nested,
                                st_hide_streamlit_element,
                                st_multiselect_allow_long_titles, st_radio)
-from dateutil.parser import parse
-from dateutil.tz import tzutc
 from dotenv import load_dotenv
 from streamlit_extras.add_vertical_space import add_vertical_space
 
 import sec_parser as sp
 import sec_parser.semantic_elements as se
-from debug_tools.parser_output_visualizer._utils.misc import add_spaces, clean_user_input
+from debug_tools.parser_output_visualizer._utils.misc import clean_user_input
 from sec_parser.data_sources.secapio_data_retriever import (
     SecapioApiKeyInvalidError, SecapioApiKeyNotSetError, SecapioDataRetriever)
 from sec_parser.semantic_elements.semantic_elements import IrrelevantElement
@@ -29,6 +29,20 @@ load_dotenv()
 
 USE_METADATA = True
 DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+TREE_ITEM_ICONS = {
+    se.TextElement: "text-paragraph",
+    se.TitleElement: "bookmark",
+    se.RootSectionElement: "journal-bookmark",
+    se.TableElement: "table",
+    se.ImageElement: "card-image",
+    se.UndeterminedElement: "question-square",
+    se.IrrelevantElement: "trash",
+    se.RootSectionSeparatorElement: "pause",
+    se.EmptyElement: "trash",
+    se.BulletpointTextElement: "blockquote-left",
+    se.FootnoteTextElement: "braces-asterisk",
+}
 
 def streamlit_app(
     *,
@@ -55,9 +69,6 @@ def streamlit_app(
     # Default values to avoid errors when HIDE_UI_ELEMENTS is True
     input_urls = []
     sections = ["part1item2"]
-    htmls: list[str] = []
-    metadatas: list[dict] = []
-    htmls_urls: list[str] = []
     elements_lists: list[list[sp.AbstractSemanticElement]] = []
     trees: list[sp.SemanticTree] = []
     tickers = ["AAPL", "GOOG"]
@@ -174,33 +185,12 @@ def streamlit_app(
 
     try:
         assert tickers or input_urls
-        for ticker in tickers:
-            metadata = get_metadata(
-                secapio_api_key, doc="10-Q", latest_from_ticker=ticker
-            )
-            metadatas.append(metadata)
-            url = metadata["linkToFilingDetails"]
-            html = download_html(
-                secapio_api_key,
-                doc="10-Q",
-                url=url,
-                sections=sections,
-                ticker=ticker,
-            )
-            htmls_urls.append(url)
-            htmls.append(html)
-        for url in input_urls:
-            html = download_html(
-                secapio_api_key,
-                doc="10-Q",
-                url=url,
-                sections=sections,
-                ticker=None,
-            )
-            metadata = get_metadata(secapio_api_key, doc="10-Q", url=url)
-            metadatas.append(metadata)
-            htmls_urls.append(url)
-            htmls.append(html)
+        htmls, metadatas, htmls_urls = fetch_reports(
+            secapio_api_key,
+            tickers=tuple(tickers),
+            urls=tuple(input_urls),
+            sections=tuple(sections) if sections is not None else None,
+        )
     except SecapioApiKeyNotSetError:
         st.error("**Error**: API key not set. Please provide a valid API key.")
         st.stop()
@@ -246,10 +236,8 @@ def streamlit_app(
             with above_step_selector:
                 st.success("Welcome! The original, unprocessed SEC EDGAR document is displayed below.\n\nTo start processing, please select a parsing step:")
 
-    for html in htmls:
-        if selected_step >= 2:
-            elements = get_semantic_elements(html)
-            elements_lists.append(elements)
+    if selected_step >= 2:
+        elements_lists = [get_semantic_elements(html) for html in htmls]
 
     if not HIDE_UI_ELEMENTS:
         do_expand_all = False
@@ -261,26 +249,21 @@ def streamlit_app(
                 add_vertical_space(2)
                 st.write("# View Options")
                 with PassthroughContext():  # replace with st.expander("") if needed
-                    counted_element_types = Counter(
-                        element.__class__
-                        for elements in elements_lists
-                        for element in elements
-                    )
-                    format_cls = (
-                        lambda cls: f'{counted_element_types[cls]}x {get_pretty_class_name(cls).replace("*","")}'
+                    counted_element_types = sum(
+                        (
+                            count_element_types(elements, elements_id=id(elements))
+                            for elements in elements_lists
+                        ),
+                        Counter(),
                     )
                     available_element_types = {
-                        format_cls(cls): cls
-                        for cls in sorted(
-                            counted_element_types.keys(),
-                            key=lambda x: counted_element_types[x],
-                            reverse=True,
-                        )
+                        f'{count}x {get_pretty_class_name(cls).replace("*","")}': cls
+                        for cls, count in counted_element_types.most_common()
                     }
                     available_values = list(available_element_types.keys())
                     preselected_types = [
-                        format_cls(cls)
-                        for cls in available_element_types.values()
+                        label
+                        for label, cls in available_element_types.items()
                         if not issubclass(cls, IrrelevantElement)
                     ]
                     selected_types = st.multiselect(
@@ -295,16 +278,19 @@ def streamlit_app(
                             " understanding the document's content."
                         ),
                     )
-                    selected_types = [
+                    selected_types = frozenset(
                         available_element_types[k] for k in selected_types
-                    ]
+                    )
 
-                    for elements in elements_lists:
-                        elements[:] = [
-                            e
-                            for e in elements
-                            if any(type(e) == t for t in selected_types)
-                        ]
+                    # Build new lists instead of filtering in place, the
+                    # originals are shared with the get_semantic_elements cache.
+                    # Types are matched exactly rather than with isinstance():
+                    # every class is its own option, so e.g. keeping TextElement
+                    # must not also keep a deselected BulletpointTextElement.
+                    elements_lists = [
+                        [e for e in elements if type(e) in selected_types]
+                        for elements in elements_lists
+                    ]
 
                     
                     left, right = st.columns(2)
@@ -359,7 +345,9 @@ def streamlit_app(
 
     for elements in elements_lists:
         if selected_step >= 3:
-            tree = get_semantic_tree(elements)
+            tree = get_semantic_tree(
+                elements, elements_key=tuple(id(e) for e in elements)
+            )
             trees.append(tree)
 
     expand_depth = 0
@@ -374,14 +362,8 @@ def streamlit_app(
             return url.split("/")[-1]
         company_name = normalize_company_name(metadata["companyName"])
         form_type = metadata["formType"]
-        filed_at = (
-            parse(metadata["filedAt"]).astimezone(tzutc()).strftime("%b %d, %Y")
-        )
-        period_of_report = (
-            parse(metadata["periodOfReport"])
-            .astimezone(tzutc())
-            .strftime("%b %d, %Y")
-        )
+        filed_at = format_utc_date(metadata["filedAt"], "%b %d, %Y")
+        period_of_report = format_utc_date(metadata["periodOfReport"], "%b %d, %Y")
         return f"**{company_name}** | {form_type} filed on {filed_at} for the period ended {period_of_report}"
     
     def get_buttons(metadata,url,*,align="end"):
@@ -424,11 +406,15 @@ def streamlit_app(
         element: sp.AbstractSemanticElement,
         do_element_render_html: bool,
     ):
+        element_html = get_element_html(
+            element,
+            element_id=id(element),
+            prettify=not do_element_render_html,
+        )
         if do_element_render_html:
-            element_html = remove_ix_tags(str(element.html_tag._bs4))
             st.markdown(element_html, unsafe_allow_html=True)
         else:
-            st.code(element.html_tag._bs4.prettify(), language="markup")
+            st.code(element_html, language="markup")
 
     if not USE_METADATA:
         metadatas = []
@@ -442,45 +428,48 @@ def streamlit_app(
             ):
                 get_buttons(metadata,url)
 
-                def render_tree_node(tree_node: sp.TreeNode, _current_depth=0):
-                    element = tree_node.semantic_element
-                    expander_title = get_pretty_class_name(element.__class__, element)
-                    with st.expander(
-                        expander_title, expanded=expand_depth > _current_depth
-                    ):
-                        render_semantic_element(element, do_element_render_html)
-                        for child in tree_node.children:
-                            render_tree_node(child, _current_depth=_current_depth + 1)
+                def render_tree_nodes(root_nodes: list[sp.TreeNode]):
+                    # Walk the tree with an explicit stack in pre-order. Child
+                    # expanders are added directly to their parent's expander,
+                    # so no nested `with` blocks are needed to keep the nesting.
+                    stack = [(st, root_node, 0) for root_node in reversed(root_nodes)]
+                    while stack:
+                        container, tree_node, depth = stack.pop()
+                        element = tree_node.semantic_element
+                        expander = container.expander(
+                            get_pretty_class_name(element.__class__, element),
+                            expanded=expand_depth > depth,
+                        )
+                        with expander:
+                            render_semantic_element(element, do_element_render_html)
+                        stack.extend(
+                            (expander, child, depth + 1)
+                            for child in reversed(tree_node.children)
+                        )
 
                 if selected_step == 1:
-                    st.markdown(remove_ix_tags(html), unsafe_allow_html=True)
+                    st.markdown(get_html_without_ix_tags(html), unsafe_allow_html=True)
                     continue
 
                 if selected_step == 3:
-                    for root_node in tree.root_nodes:
-                        render_tree_node(root_node)
+                    render_tree_nodes(tree.root_nodes)
 
     if selected_step == 2:
         titles_and_elements_per_report = []
-        for elements, url, metadata in zip_longest(
-            elements_lists, htmls_urls, metadatas, fillvalue=None
+        company_names = [
+            normalize_company_name(m["companyName"]) if m else None
+            for m in metadatas
+        ]
+        company_name_counts = Counter(company_names)
+        for elements, url, metadata, company_name in zip_longest(
+            elements_lists, htmls_urls, metadatas, company_names, fillvalue=None
         ):
             element_source = ""
             if len(htmls_urls) > 1:
                 if metadata:
-                    company_name = normalize_company_name(metadata["companyName"])
-                    if (
-                        sum(
-                            1
-                            for m in metadatas
-                            if normalize_company_name(m["companyName"]) == company_name
-                        )
-                        > 1
-                    ):
-                        period_of_report = (
-                            parse(metadata["periodOfReport"])
-                            .astimezone(tzutc())
-                            .strftime("%Y-%m-%d")
+                    if company_name_counts[company_name] > 1:
+                        period_of_report = format_utc_date(
+                            metadata["periodOfReport"], "%Y-%m-%d"
                         )
                         element_source = f"*{company_name} {period_of_report}*"
                     else:
@@ -503,17 +492,18 @@ def streamlit_app(
         with sidebar_left:
             pagination_size = st.number_input(
                 "Set Page Size",
-                min_value=0,
-                value=DEFAULT_PAGE_SIZE
-                if len(titles_and_elements) > DEFAULT_PAGE_SIZE
-                else 0,
+                min_value=1,
+                max_value=MAX_PAGE_SIZE,
+                value=DEFAULT_PAGE_SIZE,
                 help=(
                     "Set the number of elements displayed per page. "
                     "Use this to manage the amount of information on the screen. "
-                    "Set to 0 to disable pagination and show all elements at once."
+                    f"At most {MAX_PAGE_SIZE} elements are shown per page."
                 ),
             )
-        if pagination_size:
+        # Always render a single page, so the number of expanders stays bounded
+        # by MAX_PAGE_SIZE regardless of how many elements the reports contain.
+        if len(titles_and_elements) > pagination_size:
             # selected_page = st.number_input("Page", min_value=1)
             selected_page = sac.pagination(
                 total=len(titles_and_elements),
@@ -541,48 +531,48 @@ def streamlit_app(
                     with st.expander(expander_title, expanded=do_expand_all):
                         render_semantic_element(element, do_element_render_html)
 
-    def to_tree_item(tree_node: sp.TreeNode, indexer):
-        element = tree_node.semantic_element
-        children = []
-        index = indexer.i()
-        for child in tree_node.children:
-            children.append(to_tree_item(child, indexer))
-        icon = {
-            se.TextElement: "text-paragraph",
-            se.TitleElement: "bookmark",
-            se.RootSectionElement: "journal-bookmark",
-            se.TableElement: "table",
-            se.ImageElement: "card-image",
-            se.UndeterminedElement: "question-square",
-            se.IrrelevantElement: "trash",
-            se.RootSectionSeparatorElement: "pause",
-            se.EmptyElement: "trash",
-            se.BulletpointTextElement: "blockquote-left",
-            se.FootnoteTextElement: "braces-asterisk",
-        }.get(element.__class__, "box")
-        return sac.TreeItem(
-            f"{add_spaces(element.__class__.__name__.replace('Element',''))}",
-            children=children,
-            icon=icon,
-            tag=f"{len(element.html_tag.get_text())}" if show_text_length else str(index),
-        )
+    def to_tree_items(root_nodes: list[sp.TreeNode]) -> list[sac.TreeItem]:
+        # Number the nodes in pre-order with an explicit stack, remembering the
+        # index of each node's parent. The items are then built in reverse
+        # order, so all children of a node exist before the node itself.
+        nodes: list[sp.TreeNode] = []
+        parent_indices: list[int | None] = []
+        stack = [(root_node, None) for root_node in reversed(root_nodes)]
+        while stack:
+            tree_node, parent_index = stack.pop()
+            index = len(nodes)
+            nodes.append(tree_node)
+            parent_indices.append(parent_index)
+            stack.extend((child, index) for child in reversed(tree_node.children))
+
+        children: list[list[sac.TreeItem]] = [[] for _ in nodes]
+        root_items = []
+        for index in reversed(range(len(nodes))):
+            element = nodes[index].semantic_element
+            tree_item = sac.TreeItem(
+                get_class_display_name(element.__class__),
+                children=children[index][::-1],
+                icon=TREE_ITEM_ICONS.get(element.__class__, "box"),
+                tag=f"{len(element.html_tag.get_text())}" if show_text_length else str(index),
+            )
+            parent_index = parent_indices[index]
+            if parent_index is None:
+                root_items.append(tree_item)
+            else:
+                children[parent_index].append(tree_item)
+        return root_items[::-1]
 
-    class Indexer:
-        def __init__(self):
-            self._i = -1
-        def i(self):
-            self._i += 1
-            return self._i
-            
     if selected_step == 3 and use_tree_view:
         documents = tuple(k for k in zip_longest(elements_lists, htmls_urls, metadatas, fillvalue=None))
         if len(documents) > 1:
-            options = [get_label(d[2], d[1]).replace("*","") for d in documents]
-            selected_option = st.selectbox("Select Report", options)
-            if not selected_option:
+            selected_index = st.selectbox(
+                "Select Report",
+                range(len(documents)),
+                format_func=lambda i: get_label(documents[i][2], documents[i][1]).replace("*",""),
+            )
+            if selected_index is None:
                 st.error("Please select a report.")
                 st.stop()
-            selected_index = options.index(selected_option)
         else:
             selected_index = 0
         metadata = documents[selected_index][2]
@@ -593,8 +583,7 @@ def streamlit_app(
         with left, st.expander("Browser", expanded=True):
             tree = trees[selected_index]
             elements = elements_lists[selected_index]
-            indexer = Indexer()
-            tree_items = [to_tree_item(k, indexer) for k in tree.root_nodes]
+            tree_items = to_tree_items(tree.root_nodes)
             
             selected_tree_item_ids = sac.tree(items=tree_items, open_all=do_expand_all, return_index=True)
             if selected_tree_item_ids is not None: